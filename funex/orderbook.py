@@ -1,7 +1,14 @@
-from datetime import datetime
-from typing import List, Optional, Union
+import time
+from typing import Iterable, Iterator, List, Optional, Union
 
-from structures import OrderList, OrderStatus, Order, OrderType
+from structures import (
+    OrderList,
+    OrderPool,
+    OrderStatus,
+    Order,
+    OrderType,
+    Tape,
+)
 
 
 class OrderBook:
@@ -11,31 +18,39 @@ class OrderBook:
     Attributes:
         ask (OrderList): The list of ask orders (sell orders).
         bid (OrderList): The list of bid orders (buy orders).
-        order_sources (dict): A dictionary mapping order types to their respective order lists.
-        tape (list): A list of filled orders with their details.
+        order_sources (tuple): The order lists indexed by order type.
+        tape (Tape): The columnar record of filled orders with their details.
+        pool (OrderPool): The removed orders recycled for reuse.
 
     Methods:
         add(order: Order) -> None: Adds a new order to the order book.
-        match(order: Order) -> List[Order]: Matches an order with counter orders.
-        fill(order: Order, counter_orders: List[Order]) -> None: Fills an order with counter orders.
-        match_fill(order: Order) -> None: Matches and fills an order.
-        get_order(order: Union[int, Order], order_type: OrderType) -> Optional[Order]: Retrieves an order from the order book.
+        add_many(orders: List[Order]) -> None: Adds a batch of new orders to the order book.
+        match(order: Order) -> Iterator[Order]: Matches an order with counter orders.
+        fill(order: Order, counter_orders: Iterable[Order]) -> None: Fills an order with counter orders.
+        match_fill(order: Order, now: Optional[int] = None) -> None: Matches and fills an order.
+        get_order(order_id: int, order_type: OrderType) -> Order: Retrieves an order from the order book.
         search_order(order: Union[Order, int], order_type: Optional[OrderType] = None): Searches for an order in the order book.
         cancel(order: Union[Order, int], order_type: Optional[OrderType] = None): Cancels an order.
         expire(order: Union[Order, int], order_type: Optional[OrderType] = None): Expires an order.
         restore(order: Union[Order, int], order_type: Optional[OrderType] = None): Restores a cancelled or expired order.
-        remove_order(order: Union[Order, int], order_type: Optional[OrderType] = None): Removes an order from the order book.
+        remove_order(order: Union[Order, int], order_type: Optional[OrderType] = None, recycle: bool = False): Removes an order from the order book.
+        pop_old(dtime: float) -> List[Order]: Removes the inactive orders not updated for a while.
         modify(order: Union[Order, int], order_type: Optional[OrderType] = None, price: Optional[float] = None, volume: Optional[float] = None): Modifies an order's price or volume.
-        proceede() -> List[dict]: Retrieves the filled orders from the order book and clears the tape.
+        proceede() -> Tape: Retrieves the filled orders from the order book and starts a new tape.
+        recycle_tape(tape: Tape) -> None: Gives a processed tape back for reuse.
 
     """
 
+    __slots__ = ("ask", "bid", "order_sources", "tape", "pool", "_tapes")
+
     def __init__(self):
 
         self.ask = OrderList(order_type=OrderType.ASK)
         self.bid = OrderList(order_type=OrderType.BID)
-        self.order_sources = {OrderType.ASK: self.ask, OrderType.BID: self.bid}
-        self.tape = []
+        self.order_sources = (self.ask, self.bid)
+        self.tape = Tape()
+        self.pool = OrderPool()
+        self._tapes: List[Tape] = []
 
     def add(self, order_: Order) -> None:
         """
@@ -44,90 +59,144 @@ class OrderBook:
         :param order_: The order to be added.
         :type order_: Order
         """
-        order_.listed = datetime.now()
+        now = time.time_ns()
+        order_.listed = now
         self.order_sources[order_.order_type].add(order_)
-        self.match_fill(order_)
+        self.match_fill(order_, now)
 
-    def match(self, order_: Order) -> List[Order]:
+    def add_many(self, orders_: List[Order]) -> None:
+        """
+        Adds a batch of orders to the order book, with the same outcome as adding them one by one.
+        All orders of the batch are listed at the same time.
+        When no order of the batch can cross the book or another order of the batch, the orders are
+        inserted level by level without matching; otherwise they are added and matched in sequence.
+
+        :param orders_: The orders to be added, in arrival order.
+        :type orders_: List[Order]
+        """
+        now = time.time_ns()
+        asks, bids = [], []
+        for order_ in orders_:
+            order_.listed = now
+            if order_.order_type == OrderType.ASK:
+                asks.append(order_)
+            else:
+                bids.append(order_)
+        ask_prices = [o.price for o in asks if o.status.is_active]
+        bid_prices = [o.price for o in bids if o.status.is_active]
+        best_ask = self.ask.best_price()
+        best_bid = self.bid.best_price()
+        if best_ask is not None:
+            ask_prices.append(best_ask)
+        if best_bid is not None:
+            bid_prices.append(best_bid)
+        if not ask_prices or not bid_prices or max(bid_prices) < min(ask_prices):
+            self.ask.extend(asks)
+            self.bid.extend(bids)
+            return
+        for order_ in orders_:
+            self.order_sources[order_.order_type].add(order_)
+            self.match_fill(order_, now)
+
+    def match(self, order_: Order) -> Iterator[Order]:
         """
         Matches the given order with the corresponding orders in the order book.
+        Counter orders are yielded in price-time priority: best price level first, oldest order first within a level.
+        Every level is snapshotted before its orders are yielded, so the consumer can fill or remove them while iterating.
 
         :param order_: The order to be matched.
         :type order_: Order
-        :return: A list of matched orders.
-        :rtype: List[Order]
+        :return: An iterator over the matched orders.
+        :rtype: Iterator[Order]
         """
-        matched = []
         if order_.order_type == OrderType.ASK:
-            matched = self.bid.bisect_left(order_)
+            levels = self.bid.bisect_left(order_.price)
         else:
-            matched = self.ask.bisect_right(order_)
-        matched.sort(key=lambda x: x.listed)
-        return matched
+            levels = self.ask.bisect_right(order_.price)
+        for level in levels:
+            yield from list(level.values())
 
-    def fill(self, order_: Order, counter_orders: List[Order]) -> None:
+    def fill(self, order_: Order, counter_orders: Iterable[Order]) -> None:
         """
         Fills the given order with the counter orders.
 
         :param order_: The order to be filled.
         :type order_: Order
-        :param counter_orders: The list of counter orders.
-        :type counter_orders: List[Order]
+        :param counter_orders: The counter orders, in the order they should be filled.
+        :type counter_orders: Iterable[Order]
         """
-        if not counter_orders:
-            return
         source = self.order_sources[order_.order_type]
-        c_source = self.order_sources[counter_orders[0].order_type]
+        c_source = self.order_sources[1 - order_.order_type]
+        fill, c_fill = source.fill_order, c_source.fill_order
+        tape_append = self.tape.append
+        filled = OrderStatus.FILLED
+        # every trade of one batch happens at the same logical time
+        now = time.time_ns()
         for c_order in counter_orders:
             price_ = c_order.price
             volume_ = min(order_.volume, c_order.volume)
-            source.fill(order_, volume_)
-            c_source.fill(c_order, volume_)
-            self.tape.append(
-                {
-                    "order": order_.id,
-                    "contr_order": c_order.id,
-                    "price": price_,
-                    "volume": volume_,
-                    "time": datetime.now(),
-                }
-            )
-            if order_.status == OrderStatus.FILLED:
+            fill(order_, volume_, now)
+            c_fill(c_order, volume_, now)
+            tape_append(order_.id, c_order.id, price_, volume_, now)
+            if order_.status == filled:
                 break
 
-    def match_fill(self, order: Order) -> None:
+    def match_fill(self, order: Order, now: Optional[int] = None) -> None:
         """
         Matches the given order with existing orders in the order book and fills the order if there is a match.
+        It runs the loops of match and fill in a single frame, as it is called for every submitted order.
+        Orders that cannot cross the best counter price leave right away, as most submitted orders just rest.
 
         :param order: The order to be matched and filled.
         :type order: Order
+        :param now: The time of the trades in nanoseconds, defaults to the current time. Callers that already read the clock pass it on.
+        :type now: Optional[int], optional
         """
-        matched = self.match(order)
-        self.fill(order, matched)
-
-    def get_order(
-        self, order_: Union[int, Order], order_type_: OrderType
-    ) -> Optional[Order]:
+        source = self.order_sources[order.order_type]
+        c_source = self.order_sources[1 - order.order_type]
+        best = c_source.best_price()
+        if best is None:
+            return
+        # only the direction of the cross depends on the side
+        if order.order_type == OrderType.ASK:
+            if best < order.price:
+                return
+            levels = c_source.bisect_left(order.price)
+        else:
+            if best > order.price:
+                return
+            levels = c_source.bisect_right(order.price)
+        fill, c_fill = source.fill_order, c_source.fill_order
+        tape_append = self.tape.append
+        filled = OrderStatus.FILLED
+        if now is None:
+            now = time.time_ns()
+        for level in levels:
+            # the values view follows the level, so it is taken once per level
+            orders = level.values()
+            while level:
+                c_order = next(iter(orders))
+                volume_ = min(order.volume, c_order.volume)
+                fill(order, volume_, now)
+                c_fill(c_order, volume_, now)
+                tape_append(order.id, c_order.id, c_order.price, volume_, now)
+                if order.status == filled:
+                    return
+
+    def get_order(self, order_id: int, order_type_: OrderType) -> Order:
         """
         Get an order from the order book.
 
-        :param order_: The order ID or the Order object.
-        :type order_: Union[int, Order]
+        :param order_id: The ID of the order.
+        :type order_id: int
         :param order_type_: The type of the order.
         :type order_type_: OrderType
-        :raises ValueError: If the order type is invalid.
         :raises ValueError: If the order is not found.
-        :return: The order if found, otherwise None.
-        :rtype: Optional[Order]
+        :return: The found order.
+        :rtype: Order
         """
-        order_ = None
-        if isinstance(order_, int):
-            order_ = self.order_sources[order_type_].get(order_)
-        elif isinstance(order_, Order):
-            order_ = self.order_sources[order_.order_type].get(order_.id)
-        else:
-            raise ValueError("Invalid order type")
-        if not order_:
+        order_ = self.order_sources[OrderType(order_type_)].get(order_id)
+        if order_ is None:
             raise ValueError("Order not found")
         return order_
 
@@ -135,32 +204,29 @@ class OrderBook:
         self,
         order_: Union[Order, int],
         order_type_: Optional[OrderType] = None,
-    ) -> Optional[Order]:
+    ) -> Order:
         """
         Search for an order in the order book.
 
         :param order_: The order to search for. Can be an instance of `Order` or an integer representing the order ID.
         :type order_: Union[Order, int]
-        :param order_type_: The type of order to search for. Defaults to None.
+        :param order_type_: The type of order to search for, ignored for an `Order` instance. Defaults to None.
         :type order_type_: Optional[OrderType]
         :raises ValueError: If an invalid order type is provided.
         :raises ValueError: If the order is not found in any of the order sources.
         :return: The found order.
         :rtype: Order
         """
-        if order_type_:
-            return self.get_order(order_, order_type_)
         if isinstance(order_, Order):
-            order_type_ = order_.order_type
-            return self.get_order(order_, order_type_)
-        if isinstance(order_, int):
-            order_id = order_
-        else:
+            return self.get_order(order_.id, order_.order_type)
+        if not isinstance(order_, int):
             raise ValueError("Invalid order type")
-        for source in self.order_sources.values():
-            order_ = source.get(order_id)
-            if order_:
-                return order_
+        if order_type_ is not None:
+            return self.get_order(order_, order_type_)
+        for source in self.order_sources:
+            found = source.get(order_)
+            if found is not None:
+                return found
         raise ValueError("Order not found")
 
     def cancel(
@@ -179,7 +245,7 @@ class OrderBook:
         if not order_.status.is_active:
             raise ValueError("Order is already cancelled or expired")
         source = self.order_sources[order_.order_type]
-        source.cancel(order_)
+        source.unlist(order_, OrderStatus.CANCELLED)
 
     def expire(
         self, order_: Union[Order, int], order_type_: Optional[OrderType] = None
@@ -197,7 +263,7 @@ class OrderBook:
         if not order_.status.is_active:
             raise ValueError("Order is already cancelled or expired")
         source = self.order_sources[order_.order_type]
-        source.expire(order_)
+        source.unlist(order_, OrderStatus.EXPIRED)
 
     def restore(
         self, order_: Union[Order, int], order_type_: Optional[OrderType] = None
@@ -220,7 +286,10 @@ class OrderBook:
         self.match_fill(order_)
 
     def remove_order(
-        self, order_: Union[Order, int], order_type_: Optional[OrderType] = None
+        self,
+        order_: Union[Order, int],
+        order_type_: Optional[OrderType] = None,
+        recycle: bool = False,
     ) -> None:
         """
         Remove an order from the order book.
@@ -229,10 +298,26 @@ class OrderBook:
         :type order_: Union[Order, int]
         :param order_type_: The type of order to be removed. Defaults to None.
         :type order_type_: Optional[OrderType]
+        :param recycle: Whether to put the removed order back into the pool, defaults to False. A later pool.get overwrites a recycled order, so the caller must not hold on to it.
+        :type recycle: bool, optional
         """
         order_ = self.search_order(order_, order_type_)
         source = self.order_sources[order_.order_type]
         source.remove(order_)
+        if recycle:
+            self.pool.put(order_)
+
+    def pop_old(self, dtime: float) -> List[Order]:
+        """
+        Removes the cancelled, expired and filled orders that have not been updated for the given time.
+
+        :param dtime: The time, in seconds, an inactive order is kept after its last update.
+        :type dtime: float
+        :return: The removed orders.
+        :rtype: List[Order]
+        """
+        cutoff = time.time_ns() - int(dtime * 1e9)
+        return self.ask.pop_old(cutoff) + self.bid.pop_old(cutoff)
 
     def modify(
         self,
@@ -258,12 +343,28 @@ class OrderBook:
         source.modify(order_, price_, volume_)
         self.match_fill(order_)
 
-    def proceede(self):
+    def proceede(self) -> Tape:
+        """
+        Hands over the recorded trades and starts a new tape, reusing a recycled one if there is any.
+        The trades are not copied.
 
-        tape = self.tape.copy()
-        self.tape.clear()
+        :return: The tape holding the trades recorded so far.
+        :rtype: Tape
+        """
+        tape, self.tape = self.tape, self._tapes.pop() if self._tapes else Tape()
         return tape
 
+    def recycle_tape(self, tape: Tape) -> None:
+        """
+        Gives a tape handed over by 'proceede' back to the order book once its trades are processed.
+        The tape is cleared and reused by a later 'proceede', it must not be used by the caller afterwards.
+
+        :param tape: The processed tape.
+        :type tape: Tape
+        """
+        tape.clear()
+        self._tapes.append(tape)
+
 
 if __name__ == "__main__":
     order_book = OrderBook()
@@ -271,27 +372,27 @@ if __name__ == "__main__":
     from structures import OrderIdGenerator
 
     g_enj = OrderIdGenerator()
-    next(g_enj)
+    g_enj.next_id()
     # Generate additional test data
     for _ in range(30):
-        id_ = next(g_enj)
+        id_ = g_enj.next_id()
         order_type = random.choice([OrderType.ASK, OrderType.BID])
         price = random.randint(90, 110)
         volume = random.randint(5, 25)
         owner_id = random.randint(1, 10)
         # print(id_)
-        order = Order(
+        order = order_book.pool.get(
             id=id_, order_type=order_type, price=price, volume=volume, owner_id=owner_id
         )
         order_book.add(order)
     import pprint
 
-    pprint.pprint(order_book.tape)
+    pprint.pprint(list(order_book.tape))
     print("Number of bids:", len(order_book.bid))
     print("Number of asks:", len(order_book.ask))
     print("\n\n\n\n\n___________________\n asks:\n")
     for order in order_book.ask:
-        pprint.pprint(order.dict())
+        pprint.pprint(order.to_dict())
     print("\n\n\n___________________\n bids:\n")
     for order in order_book.bid:
-        pprint.pprint(order.dict())
+        pprint.pprint(order.to_dict())
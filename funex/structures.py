@@ -1,54 +1,112 @@
+import atexit
+import heapq
+import mmap
 import os
-from datetime import datetime
-from enum import Enum, auto
-from typing import Any, Optional, Union, List
-from pydantic import BaseModel, PositiveInt, PositiveFloat
-from sortedcontainers import SortedList
+import time
+import warnings
+from array import array
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from enum import IntEnum
+from itertools import chain, count
+from typing import Dict, Iterable, Iterator, Optional, Union, List
+from sortedcontainers import SortedDict
 
 
 class OrderIdGenerator:
     """
     A class that generates unique order IDs.
+    IDs are reserved in blocks: the end of the current block is persisted through a memory map of the state file
+    and flushed to disk before any ID of the block is handed out, then IDs are generated in memory.
+    A crash can skip the rest of a block, but never issues an ID twice. The generator is closed at interpreter exit.
 
     Attributes:
         filepath (str): The file path to store the current state of the ID counter.
         id_counter (int): The current value of the ID counter.
-        iterations_since_last_save (int): The number of iterations since the last state save.
-        save_frequency (int): The frequency at which the state should be saved.
+        reserved_until (int): The end of the reserved block, the first ID that is not reserved yet.
 
     Methods:
         __iter__(): Returns the iterator object itself.
-        __next__(): Returns the next unique order ID.
+        next_id(): Returns the next unique order ID.
+        __next__(): Same as next_id(), for use as an iterator.
+        reserve(): Reserves and persists the next block of IDs.
         save_state(): Saves the current state of the ID counter to a file.
         load_state(): Loads the previous state of the ID counter from a file.
         reset_state(): Resets the ID counter to 0 and saves the state.
+        close(): Gives back the unused IDs of the block, flushes the state and unmaps the file.
     """
 
+    STATE_WIDTH = 20
+    RESERVE_SIZE = 10_000
+
     def __init__(self):
         self.filepath = os.path.join(os.getcwd(), "current_state.txt")
         self.id_counter = self.load_state()
-        self.iterations_since_last_save = 0
-        self.save_frequency = 100
+        self.reserved_until = self.id_counter
+        self._state = self._map_state()
+        self.save_state()
+        # a clean shutdown gives back the unused block without an explicit close
+        atexit.register(self.close)
 
     def __iter__(self):
         return self
 
-    def __next__(self):
-        current_id = self.id_counter
-        self.id_counter += 1
-        self.iterations_since_last_save += 1
-        if self.iterations_since_last_save >= self.save_frequency:
-            self.save_state()
-            self.iterations_since_last_save = 0
+    def next_id(self) -> int:
+        """
+        Returns the next unique order ID, reserving a new block when the current one is used up.
 
+        :raises ValueError: If the generator is closed.
+        :return: The next unique order ID.
+        :rtype: int
+        """
+        current_id = self.id_counter
+        if current_id >= self.reserved_until:
+            self.reserve()
+        self.id_counter = current_id + 1
         return current_id
 
+    __next__ = next_id
+
+    def reserve(self) -> None:
+        """
+        Reserves the next block of IDs and flushes its end to disk.
+        """
+        self._ensure_open()
+        self.reserved_until = self.id_counter + self.RESERVE_SIZE
+        self.save_state()
+        self._state.flush()
+
+    def _map_state(self) -> mmap.mmap:
+        """
+        Maps the state file into memory, resizing it to the fixed state width.
+
+        :return: The writable memory map of the state file.
+        :rtype: mmap.mmap
+        """
+        fd = os.open(self.filepath, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, self.STATE_WIDTH)
+            return mmap.mmap(fd, self.STATE_WIDTH)
+        finally:
+            os.close(fd)
+
+    def _ensure_open(self) -> None:
+        """
+        Checks that the state file is still mapped.
+
+        :raises ValueError: If the generator is closed.
+        """
+        if self._state.closed:
+            raise ValueError("Order ID generator is closed")
+
     def save_state(self) -> None:
         """
-        Saves the current state of the ID counter to a file.
+        Saves the current state of the ID counter to a file: the end of the reserved block, where the next run starts.
+
+        :raises ValueError: If the generator is closed.
         """
-        with open(self.filepath, "w", encoding="utf-8") as f:
-            f.write(str(self.id_counter))
+        self._ensure_open()
+        self._state[:] = b"%0*d" % (self.STATE_WIDTH, self.reserved_until)
 
     def load_state(self) -> None:
         """
@@ -57,78 +115,125 @@ class OrderIdGenerator:
         if not os.path.exists(self.filepath):
             return 0
         with open(self.filepath, "r", encoding="utf-8") as f:
-            saved_state = f.read()
-            return int(saved_state)
+            saved_state = f.read().strip("\0")
+            return int(saved_state) if saved_state else 0
 
     def reset_state(self) -> None:
         """
-        Resets the state of the object by setting the id_counter to 0 and saving the state.
+        Resets the state of the object by setting the id_counter to 0 and saving the state, flushed to disk right away.
+
+        :raises ValueError: If the generator is closed.
         """
+        self._ensure_open()
         self.id_counter = 0
+        self.reserved_until = 0
+        self.save_state()
+        self._state.flush()
+
+    def close(self) -> None:
+        """
+        Gives back the unused IDs of the current block, so the next run starts right after the last issued ID.
+        The state is flushed to disk once and the file is unmapped, the generator can not be used afterwards.
+        It is no longer closed at interpreter exit, so it can be freed.
+        """
+        if self._state.closed:
+            return
+        atexit.unregister(self.close)
+        self.reserved_until = self.id_counter
         self.save_state()
+        self._state.flush()
+        self._state.close()
 
 
 # ID_GENERATOR = OrderIdGenerator()
 
 
-class OrderStatus(Enum):
+class OrderStatus(IntEnum):
     """
     Enum representing the status of an order.
+    Every status is a distinct bit, so a set of statuses is an integer mask, see ACTIVE_MASK.
 
     Attributes:
         CREATED: The order has been created.
         PARTIALLY_FILLED: The order has been partially filled.
-        FILLED: The order has been completely filled.
         MODIFIED: The order has been modified.
-        CANCELLED: The order has been cancelled.
         RESTORED: The order has been restored.
+        FILLED: The order has been completely filled.
+        CANCELLED: The order has been cancelled.
         EXPIRED: The order has expired.
 
-    Methods:
-        is_active(): Checks if the order status is active.
-
+    Every member also carries an is_active flag, True for the statuses in ACTIVE_MASK.
+    Order statuses are always members, so the collections read the flag instead of masking.
     """
 
-    CREATED = auto()
-    PARTIALLY_FILLED = auto()
-    FILLED = auto()
-    MODIFIED = auto()
-    CANCELLED = auto()
-    RESTORED = auto()
-    EXPIRED = auto()
+    CREATED = 1
+    PARTIALLY_FILLED = 2
+    MODIFIED = 4
+    RESTORED = 8
+    FILLED = 16
+    CANCELLED = 32
+    EXPIRED = 64
 
-    @property
-    def is_active(self):
-        """
-        Checks if the order status is active.
+    # set on every member below, once ACTIVE_MASK exists; an annotation alone creates no member
+    is_active: bool
 
-        Returns:
-            bool: True if the order status is active, False otherwise.
-        """
-        return self in {
-            OrderStatus.CREATED,
-            OrderStatus.PARTIALLY_FILLED,
-            OrderStatus.MODIFIED,
-            OrderStatus.RESTORED,
-        }
 
+ACTIVE_MASK = (
+    OrderStatus.CREATED
+    | OrderStatus.PARTIALLY_FILLED
+    | OrderStatus.MODIFIED
+    | OrderStatus.RESTORED
+)
 
-class OrderType(Enum):
+# members are singletons, so the flag is computed once here instead of on every access
+for _status in OrderStatus:
+    _status.is_active = bool(_status & ACTIVE_MASK)
+del _status
+
+
+class OrderType(IntEnum):
     """
     Enum representing the type of an order.
+    The values are consecutive, so an order type can index a sequence of sides directly, and 1 - order_type indexes the opposite side.
+    The former string values 'ask' and 'bid' are still accepted, e.g. OrderType("ask") is OrderType.ASK.
 
     Attributes:
-        ASK (str): Represents an ask order.
-        BID (str): Represents a bid order.
+        ASK (int): Represents an ask order.
+        BID (int): Represents a bid order.
     """
 
-    ASK = "ask"
-    BID = "bid"
+    ASK = 0
+    BID = 1
+
+    @classmethod
+    def _missing_(cls, value):
+        if isinstance(value, str):
+            return cls.__members__.get(value.upper())
+        return None
 
 
-class Order(BaseModel):
+class ListingMode(IntEnum):
+    """
+    Enum representing how an order added to an order list is listed.
+    NEVER and ALWAYS equal False and True, so booleans can be passed as well.
+
+    Attributes:
+        NEVER (int): The order is never listed.
+        ALWAYS (int): The order is always listed.
+        AUTO (int): The order is listed if it is active.
+    """
+
+    NEVER = 0
+    ALWAYS = 1
+    AUTO = 2
+
+
+@dataclass(slots=True, kw_only=True, eq=False)
+class Order:
     """
     Represents an order in the order book.
+    Orders are slotted dataclasses: attribute writes are plain slot stores, the fields are validated once on creation.
+    Orders compare and hash by identity, as two orders with equal fields are still distinct orders.
 
     :param id: The unique identifier of the order.
     :type id: int
@@ -140,80 +245,194 @@ class Order(BaseModel):
     :type volume: int
     :param owner_id: The ID of the owner of the order.
     :type owner_id: int
-    :param status: The status of the order (optional).
+    :param status: The status of the order, defaults to OrderStatus.CREATED.
     :type status: OrderStatus, optional
-    :param created: The timestamp when the order was created (optional).
-    :type created: datetime, optional
-    :param updated: The timestamp when the order was last updated (optional).
-    :type updated: datetime, optional
-    :param listed: The timestamp when the order was listed (optional).
-    :type listed: datetime, optional
+    :param created: The time when the order was created, in nanoseconds since the epoch (optional).
+    :type created: int, optional
+    :param updated: The time when the order was last updated, in nanoseconds since the epoch (optional).
+    :type updated: int, optional
+    :param listed: The time when the order was listed, in nanoseconds since the epoch (optional).
+    :type listed: int, optional
+    :ivar is_listed: Whether the order currently sits in a price level of an order list. Maintained by OrderList.
+    :vartype is_listed: bool
+    :raises ValueError: If the id, price, volume or owner id is not positive.
+    :raises ValueError: If the volume is not an integer or the order type is unknown.
     """
 
-    id: PositiveInt
+    id: int
     order_type: OrderType
-    price: PositiveFloat
-    volume: PositiveInt
-    owner_id: PositiveInt
-    status: Optional[OrderStatus] = None
-    created: Optional[datetime] = None
-    updated: Optional[datetime] = None
-    listed: Optional[datetime] = None
-
-    def __init__(self, **data):
+    price: float
+    volume: int
+    owner_id: int
+    status: OrderStatus = OrderStatus.CREATED
+    created: Optional[int] = None
+    updated: Optional[int] = None
+    listed: Optional[int] = None
+    is_listed: bool = field(default=False, init=False)
+
+    def __post_init__(self) -> None:
         # logging here
-        super().__init__(**data)
-        if self.status is None:
-            self.status = OrderStatus.CREATED
-        now = datetime.now()
-        if self.created is None:
-            self.created = now
-        if self.updated is None:
-            self.updated = now
-
-    def __setattr__(self, name: str, value: Any) -> None:
-        if name != "updated":
-            super().__setattr__("updated", datetime.now())
+        if self.volume.__class__ is not int:
+            if isinstance(self.volume, float) and self.volume.is_integer():
+                self.volume = int(self.volume)
+            else:
+                raise ValueError("Volume must be an integer")
+        if self.id <= 0 or self.volume <= 0 or self.owner_id <= 0:
+            raise ValueError("Order id, volume and owner id must be positive")
+        if self.price <= 0:
+            raise ValueError("Price must be positive")
+        # the coercions and the clock read only run when they have something to do
+        if self.order_type.__class__ is not OrderType:
+            self.order_type = OrderType(self.order_type)
+        if self.status.__class__ is not OrderStatus:
+            self.status = OrderStatus(self.status)
+        if self.price.__class__ is not float:
+            self.price = float(self.price)
+        if self.created is None or self.updated is None:
+            now = time.time_ns()
+            if self.created is None:
+                self.created = now
+            if self.updated is None:
+                self.updated = now
+
+    def touch(self, now: Optional[int] = None) -> None:
+        """
+        Stamps the order as updated. Called once by every mutation of the order state.
+
+        :param now: The update time in nanoseconds, defaults to the current time.
+        :type now: Optional[int], optional
+        """
         # logging here
-        return super().__setattr__(name, value)
-
-    def __lt__(self, other: Union[int, float, "Order"]):
-        if isinstance(other, (int, float)):
-            return self.price < other
-        if isinstance(other, Order):
-            return self.price < other.price
-        return NotImplemented
-
-    def __gt__(self, other: Union[int, float, "Order"]):
-        if isinstance(other, (int, float)):
-            return self.price > other
-        if isinstance(other, Order):
-            return self.price > other.price
-        return NotImplemented
-
-    def __le__(self, other: Union[int, float, "Order"]):
-        if isinstance(other, (int, float)):
-            return self.price <= other
-        if isinstance(other, Order):
-            return self.price <= other.price
-        return NotImplemented
-
-    def __ge__(self, other: Union[int, float, "Order"]):
-        if isinstance(other, (int, float)):
-            return self.price >= other
-        if isinstance(other, Order):
-            return self.price >= other.price
-        return NotImplemented
+        self.updated = time.time_ns() if now is None else now
+
+    def to_dict(self) -> Dict[str, Union[int, float, bool, None]]:
+        """
+        Gets the fields of the order as a dict, for logging and serialization.
+        Unlike dataclasses.asdict, the dict is built in one step without copying the field values.
+
+        :return: The fields of the order keyed by name.
+        :rtype: Dict[str, Union[int, float, bool, None]]
+        """
+        return {
+            "id": self.id,
+            "order_type": self.order_type,
+            "price": self.price,
+            "volume": self.volume,
+            "owner_id": self.owner_id,
+            "status": self.status,
+            "created": self.created,
+            "updated": self.updated,
+            "listed": self.listed,
+            "is_listed": self.is_listed,
+        }
+
+
+class OrderPool:
+    """
+    Order Pool keeps removed orders for reuse, so order turnover does not allocate a new object for every order.
+    A recycled order has all of its fields reset and goes through the same validation as a new one.
+    """
+
+    def __init__(self) -> None:
+        self.__free: List[Order] = []
+
+    def get(
+        self,
+        *,
+        id: int,
+        order_type: OrderType,
+        price: float,
+        volume: int,
+        owner_id: int,
+        status: OrderStatus = OrderStatus.CREATED,
+        created: Optional[int] = None,
+        updated: Optional[int] = None,
+        listed: Optional[int] = None,
+    ) -> Order:
+        """
+        Gets an order with the given fields, recycling a pooled order if there is one.
+
+        :raises ValueError: If the id, price, volume or owner id is not positive.
+        :raises ValueError: If the volume is not an integer or the order type is unknown.
+        :return: The order, not listed in any collection.
+        :rtype: Order
+        """
+        if not self.__free:
+            return Order(
+                id=id,
+                order_type=order_type,
+                price=price,
+                volume=volume,
+                owner_id=owner_id,
+                status=status,
+                created=created,
+                updated=updated,
+                listed=listed,
+            )
+        order = self.__free.pop()
+        order.id = id
+        order.order_type = order_type
+        order.price = price
+        order.volume = volume
+        order.owner_id = owner_id
+        order.status = status
+        order.created = created
+        order.updated = updated
+        order.listed = listed
+        try:
+            order.__post_init__()
+        except ValueError:
+            self.__free.append(order)
+            raise
+        return order
+
+    def put(self, order: Order) -> None:
+        """
+        Puts an order back into the pool. The order must not be used by its previous holder afterwards.
+
+        :param order: The order to be recycled.
+        :type order: Order
+        :raises ValueError: If the order is still listed.
+        """
+        if order.is_listed:
+            raise ValueError("Listed orders can not be recycled")
+        self.__free.append(order)
+
+    def __len__(self):
+        return len(self.__free)
+
+
+# the string spellings of the listing modes, resolved before dispatching on the mode
+_TOLIST_MODES = {
+    "auto": ListingMode.AUTO,
+    "y": ListingMode.ALWAYS,
+    "yes": ListingMode.ALWAYS,
+    "n": ListingMode.NEVER,
+    "no": ListingMode.NEVER,
+}
 
 
 class OrderList:
     """
     Order List is a collection of orders. It is used to store and manage orders.
-    Active orders are stored in a sorted list with search complexity of O(log n) and insertion complexity of O(n).
+    Active orders are grouped into price levels: a sorted dict maps every price to an ordered dict of orders keyed by ID, in time priority.
+    Level lookup and insertion cost O(log p), where p is the number of distinct prices, appending to a level
+    and removing any order from it by ID are O(1).
     All orders are indexed by their id for O(1) access.
-    Active orders can be reached through bisect operations.
+    Active orders can be reached level by level through bisect operations.
     """
 
+    __slots__ = (
+        "__levels",
+        "__ids",
+        "otype",
+        "__descending",
+        "__best_index",
+        "__best",
+        "__inactive",
+        "__inactive_seq",
+    )
+
     def __init__(
         self,
         order_type: OrderType,
@@ -222,44 +441,95 @@ class OrderList:
         """
         Initializes a collection of orders of a specified type. All orders within the collection must share the same order type.
 
-        :param order_type: The type of orders to be stored in the list, e.g., 'ask' or 'bid'. The specific types are defined in the OrderType enum.
+        :param order_type: The type of orders to be stored in the list, e.g., ask or bid. The specific types are defined in the OrderType enum.
         :type order_type: OrderType
-        :param order_list: Initial list of orders to be added to the collection, defaults to None. Each order in the list is added to the collection using the 'add' method logic.
+        :param order_list: Initial list of orders to be added to the collection, defaults to None. The orders are added in bulk using the 'extend' method logic.
         :type order_list: Optional[List[Order]], optional
         """
-        self.__order_list = SortedList()
+        self.__levels = SortedDict()
         self.__ids = {}
         self.otype = order_type
+        # bids are best at the highest price, asks at the lowest
+        self.__descending = order_type == OrderType.BID
+        self.__best_index = -1 if self.__descending else 0
+        # best listed price, kept up to date whenever a price level is created or dropped
+        self.__best = None
+        # heap of (updated, id, seq, order) entries, the least recently updated inactive order first;
+        # seq breaks ties between entries of the same order so orders themselves are never compared
+        self.__inactive = []
+        self.__inactive_seq = count()
         if order_list:
-            for order in order_list:
-                self.add(order)
+            self.extend(order_list)
 
-    def add(self, order: Order, tolist: Union[bool, str] = "auto") -> None:
+    def add(
+        self,
+        order: Order,
+        tolist: Union[ListingMode, bool, str] = ListingMode.AUTO,
+    ) -> None:
         """
-        Adds an order to the collection. The order is only added to the sorted list if it meets the criteria defined by the 'tolist' parameter. By default ('auto'), active orders are added to the sorted list.
+        Adds an order to the collection. The order is only added to the sorted list if it meets the criteria defined by the 'tolist' parameter. By default (AUTO), active orders are added to the sorted list.
 
         :param order: The order to be added to the collection.
         :type order: Order
-        :param tolist: Specifies how the order should be added to the list. 'auto' adds active orders automatically; True or 'y'/'yes' always adds; False or 'n'/'no' never adds. Defaults to 'auto'.
-        :type tolist: Union[bool, str], optional
+        :param tolist: Specifies how the order should be added to the list. AUTO or 'auto' adds active orders automatically; ALWAYS, True or 'y'/'yes' always adds; NEVER, False or 'n'/'no' never adds. Defaults to AUTO.
+        :type tolist: Union[ListingMode, bool, str], optional
         :raises ValueError: If the order's type does not match the collection's type.
         :raises ValueError: If 'tolist' is given an invalid value.
         """
         if order.order_type != self.otype:
             raise ValueError("Order type must be the same as the list type")
-        if tolist == "auto":
+        if tolist.__class__ is str:
+            tolist = _TOLIST_MODES.get(tolist)
+        if tolist == ListingMode.AUTO:
             if order.status.is_active:
                 if order.listed is None:
-                    order.listed = datetime.now()
-                self.__order_list.add(order)
-        elif tolist is True or tolist in ["y", "yes"]:
-            self.__order_list.add(order)
-        elif tolist is False or tolist in ["n", "no"]:
-            pass
-        else:
+                    order.listed = time.time_ns()
+                self.__insert(order)
+        elif tolist == ListingMode.ALWAYS:
+            self.__insert(order)
+        elif tolist != ListingMode.NEVER:
             raise ValueError("Invalid value for tolist")
+        if not order.status.is_active:
+            self.__retire(order)
         self.__ids[order.id] = order
 
+    def extend(self, orders: Iterable[Order]) -> None:
+        """
+        Adds several orders to the collection, listing the active ones as 'add' does by default.
+        Orders are grouped by price first, so every touched price level is looked up only once.
+        Orders keep their relative order within a price level.
+
+        :param orders: The orders to be added to the collection.
+        :type orders: Iterable[Order]
+        :raises ValueError: If the type of any order does not match the collection's type.
+        """
+        orders = list(orders)
+        if any(order.order_type != self.otype for order in orders):
+            raise ValueError("Order type must be the same as the list type")
+        now = time.time_ns()
+        groups = defaultdict(list)
+        for order in orders:
+            if order.status.is_active:
+                if order.listed is None:
+                    order.listed = now
+                if order.is_listed:
+                    self.__discard(order)
+                groups[order.price].append(order)
+                order.is_listed = True
+            else:
+                self.__retire(order)
+        # merging a dict grows the id index once to fit the whole batch
+        self.__ids.update({order.id: order for order in orders})
+        levels = self.__levels
+        for price, group in groups.items():
+            level = levels.get(price)
+            if level is None:
+                levels[price] = OrderedDict((order.id, order) for order in group)
+            else:
+                level.update((order.id, order) for order in group)
+        if groups:
+            self.__best = levels.peekitem(self.__best_index)[0]
+
     def get(self, order_id: int) -> Optional[Order]:
         """
         Gets an order by its ID.
@@ -271,49 +541,154 @@ class OrderList:
         """
         return self.__ids.get(order_id)
 
+    def best_price(self) -> Optional[float]:
+        """
+        Gets the best price among the listed orders: the lowest one for asks and the highest one for bids.
+
+        :return: The best price, or None if no order is listed.
+        :rtype: Optional[float]
+        """
+        return self.__best
+
+    def top(self) -> Optional[Order]:
+        """
+        Gets the order at the top of the book: the oldest listed order at the best price.
+
+        :return: The top order, or None if no order is listed.
+        :rtype: Optional[Order]
+        """
+        level = self.top_level()
+        if level is None:
+            return None
+        return next(iter(level.values()))
+
+    def top_level(self) -> Optional[Dict[int, Order]]:
+        """
+        Gets the price level at the best price, its orders keyed by ID in time priority.
+
+        :return: The best price level, or None if no order is listed.
+        :rtype: Optional[Dict[int, Order]]
+        """
+        if self.__best is None:
+            return None
+        return self.__levels[self.__best]
+
+    def __insert(self, order: Order) -> None:
+        """
+        Appends an order to the back of its price level, creating the level if needed.
+        An order that is already listed is moved to the back, losing its time priority.
+
+        :param order: The order to be inserted.
+        :type order: Order
+        """
+        if order.is_listed:
+            self.__discard(order)
+        level = self.__levels.get(order.price)
+        if level is None:
+            level = self.__levels[order.price] = OrderedDict()
+            best = self.__best
+            if best is None:
+                self.__best = order.price
+            elif (order.price > best) if self.__descending else (order.price < best):
+                self.__best = order.price
+        level[order.id] = order
+        order.is_listed = True
+
+    def __discard(self, order: Order) -> None:
+        """
+        Removes an order from its price level, dropping the level once it is empty.
+        Orders that are not listed are left alone.
+
+        :param order: The order to be removed.
+        :type order: Order
+        """
+        if not order.is_listed:
+            return
+        level = self.__levels[order.price]
+        del level[order.id]
+        if not level:
+            levels = self.__levels
+            del levels[order.price]
+            if order.price == self.__best:
+                self.__best = levels.peekitem(self.__best_index)[0] if levels else None
+        order.is_listed = False
+
+    def __price_levels(
+        self, minimum: Optional[float], maximum: Optional[float], inclusive: tuple
+    ) -> Iterator[Dict[int, Order]]:
+        """
+        Lazily yields the price levels within the given bounds, best price first.
+        The best price is the lowest one for asks and the highest one for bids.
+        Each level is looked up after the previous one has been consumed, so levels
+        that are emptied and dropped meanwhile are skipped safely.
+
+        :param minimum: The lower price bound, None for unbounded.
+        :type minimum: Optional[float]
+        :param maximum: The upper price bound, None for unbounded.
+        :type maximum: Optional[float]
+        :param inclusive: Pair of flags telling whether the bounds are inclusive.
+        :type inclusive: tuple
+        :return: An iterator over price levels, each one mapping order IDs to orders in time priority.
+        :rtype: Iterator[Dict[int, Order]]
+        """
+        levels = self.__levels
+        reverse = self.__descending
+        while True:
+            price = next(levels.irange(minimum, maximum, inclusive, reverse), None)
+            if price is None:
+                return
+            yield levels[price]
+            if reverse:
+                maximum, inclusive = price, (inclusive[0], False)
+            else:
+                minimum, inclusive = price, (False, inclusive[1])
+
     def bisect_left(
-        self, order: Union[Order, float], include_right: bool = True
-    ) -> List[Order]:
+        self, price: float, include_right: bool = True
+    ) -> Iterator[Dict[int, Order]]:
         """
-        Performs a bisect left operation on the sorted list to find the position to insert 'order' or 'price'.
-        Returns a segment of the list based on the bisect position.
+        Performs a bisect left operation on the price levels to find the position of 'price'.
+        Returns the price levels on one side of the bisect position, best price first.
 
-        :param order: Either an Order object or a float price value to perform the bisect operation.
-        :type order: Union[Order, float]
-        :param include_right: If True, returns the segment of the list from the bisect position to the end (inclusive of the position).
-                              If False, returns the segment up to the bisect position (exclusive).
+        :param price: The price to perform the bisect operation with.
+        :type price: float
+        :param include_right: If True, returns the levels priced at or above the bisect price.
+                              If False, returns the levels priced strictly below it.
                               Defaults to True.
         :type include_right: bool, optional
-        :return: A list of Orders filtered based on the bisect operation.
-        :rtype: List[Order]
+        :return: An iterator over price levels, each one mapping order IDs to orders in time priority.
+        :rtype: Iterator[Dict[int, Order]]
         """
-        cid = self.__order_list.bisect_left(order)
         if include_right:
-            return self.__order_list[cid:]
-        return self.__order_list[:cid]
+            return self.__price_levels(price, None, (True, True))
+        return self.__price_levels(None, price, (True, False))
 
     def bisect_right(
-        self, order: Union[Order, float], include_left: bool = True
-    ) -> List[Order]:
+        self, price: float, include_left: bool = True
+    ) -> Iterator[Dict[int, Order]]:
         """
-        Performs a bisect right operation on the sorted list to find the position to insert 'order' or 'price'.
-        Returns a segment of the list based on the bisect position.
+        Performs a bisect right operation on the price levels to find the position of 'price'.
+        Returns the price levels on one side of the bisect position, best price first.
 
-        :param order: Either an Order object or a float price value to perform the bisect operation.
-        :type order: Union[Order, float]
-        :param include_left: If True, returns the segment of the list up to the bisect position (inclusive).
-                             If False, returns the segment of the list from the bisect position to the end (exclusive).
+        :param price: The price to perform the bisect operation with.
+        :type price: float
+        :param include_left: If True, returns the levels priced at or below the bisect price.
+                             If False, returns the levels priced strictly above it.
                              Defaults to True.
         :type include_left: bool, optional
-        :return: A list of Orders filtered based on the bisect operation.
-        :rtype: List[Order]
+        :return: An iterator over price levels, each one mapping order IDs to orders in time priority.
+        :rtype: Iterator[Dict[int, Order]]
         """
-        cid = self.__order_list.bisect_right(order)
         if include_left:
-            return self.__order_list[:cid]
-        return self.__order_list[cid:]
+            return self.__price_levels(None, price, (True, True))
+        return self.__price_levels(price, None, (False, True))
 
-    def unlist(self, order: Union[Order, int], order_status: OrderStatus) -> None:
+    def unlist(
+        self,
+        order: Union[Order, int],
+        order_status: OrderStatus,
+        now: Optional[int] = None,
+    ) -> None:
         """
         Unlists the provided order by changing its status to the specified order_status.
 
@@ -321,6 +696,8 @@ class OrderList:
         :type order: Union[Order, int]
         :param order_status: The status to which the order will be changed.
         :type order_status: OrderStatus
+        :param now: The update time in nanoseconds, defaults to the current time.
+        :type now: Optional[int], optional
         :raises ValueError: If the provided order ID is not found.
         :raises ValueError: If the order type is invalid.
         :raises ValueError: If the order is not active.
@@ -332,12 +709,31 @@ class OrderList:
                 raise ValueError("Provided order ID not found")
         elif not isinstance(order, Order):
             raise ValueError("Invalid order type")
+        self.__unlist(order, order_status, now)
+
+    def __unlist(
+        self, order: Order, order_status: OrderStatus, now: Optional[int] = None
+    ) -> None:
+        """
+        Unlists an order of the collection once it has been resolved.
+
+        :param order: The order to be unlisted.
+        :type order: Order
+        :param order_status: The status to which the order will be changed.
+        :type order_status: OrderStatus
+        :param now: The update time in nanoseconds, defaults to the current time.
+        :type now: Optional[int], optional
+        :raises ValueError: If the order is not active.
+        :raises ValueError: If the order_status is active.
+        """
         if not order.status.is_active:
             raise ValueError("Order is not active.")
-        if order_status.is_active:
+        if order_status & ACTIVE_MASK:
             raise ValueError("Order cannot be unlisted with active status.")
-        self.__order_list.remove(order)
+        self.__discard(order)
         order.status = order_status
+        order.touch(now)
+        self.__retire(order)
 
     def relist(
         self, order: Union[Order, int], order_status: OrderStatus = OrderStatus.RESTORED
@@ -360,11 +756,12 @@ class OrderList:
                 raise ValueError("Provided order ID not found")
         elif not isinstance(order, Order):
             raise ValueError("Invalid order type")
-        if not order_status.is_active:
+        if not order_status & ACTIVE_MASK:
             raise ValueError("Active order cannot have non-active status")
         order.status = order_status
-        order.listed = datetime.now()
-        self.__order_list.add(order)
+        order.listed = time.time_ns()
+        order.touch()
+        self.__insert(order)
 
     def remove(self, order: Union[Order, int]) -> None:
         """
@@ -376,15 +773,54 @@ class OrderList:
         :raises ValueError: if order is not found
         """
         if isinstance(order, int):
-            order = self.__ids.get(order)
-            if order is None:
-                raise ValueError("Provided order ID not found")
-        elif not isinstance(order, Order):
+            order = self.__ids.pop(order, None)
+        elif isinstance(order, Order):
+            order = self.__ids.pop(order.id, None)
+        else:
             raise ValueError("Invalid order type")
+        if order is None:
+            raise ValueError("Provided order ID not found")
+        self.__discard(order)
+
+    def __retire(self, order: Order) -> None:
+        """
+        Queues an inactive order for 'pop_old', keyed by its last update time.
 
-        if order.status.is_active:
-            self.__order_list.remove(order)
-        del self.__ids[order.id]
+        :param order: The inactive order.
+        :type order: Order
+        """
+        heapq.heappush(
+            self.__inactive,
+            (order.updated, order.id, next(self.__inactive_seq), order),
+        )
+
+    def pop_old(self, cutoff: int) -> List[Order]:
+        """
+        Removes from the collection the inactive orders that were last updated before the cutoff.
+        Orders are popped from a heap of inactive orders keyed by their update time, so only the old orders are visited.
+        Queue entries left behind by orders that were restored, updated again or removed since then are dropped.
+
+        :param cutoff: Inactive orders updated before this time, in nanoseconds since the epoch, are removed.
+        :type cutoff: int
+        :return: The removed orders.
+        :rtype: List[Order]
+        """
+        inactive = self.__inactive
+        ids = self.__ids
+        old = []
+        heappop = heapq.heappop
+        while inactive and inactive[0][0] < cutoff:
+            updated, _, _, order = heappop(inactive)
+            if (
+                order.updated != updated
+                or order.status.is_active
+                or ids.get(order.id) is not order
+            ):
+                continue
+            self.__discard(order)
+            del ids[order.id]
+            old.append(order)
+        return old
 
     def expire(self, order: Union[Order, int]) -> None:
         """
@@ -410,7 +846,9 @@ class OrderList:
         """
         self.unlist(order, OrderStatus.CANCELLED)
 
-    def fill(self, order: Union[Order, int], volume: int) -> None:
+    def fill(
+        self, order: Union[Order, int], volume: int, now: Optional[int] = None
+    ) -> None:
         """
         Fill the order with the specified volume.
 
@@ -418,29 +856,50 @@ class OrderList:
         :type order: Union[Order, int]
         :param volume: The volume to be filled.
         :type volume: int
+        :param now: The update time in nanoseconds, defaults to the current time. A batch of fills can share one timestamp.
+        :type now: Optional[int], optional
         :raises ValueError: If the volume is not positive.
         :raises ValueError: If the provided order ID is not found.
         :raises ValueError: If the order type is invalid.
         :raises ValueError: If the order is not active.
         :raises ValueError: If the volume is greater than the order volume.
         """
-        if volume <= 0:
-            raise ValueError("Volume must be positive")
         if isinstance(order, int):
             order = self.__ids.get(order)
             if order is None:
                 raise ValueError("Provided order ID not found")
         elif not isinstance(order, Order):
             raise ValueError("Invalid order type")
+        self.fill_order(order, volume, now)
+
+    def fill_order(self, order: Order, volume: int, now: Optional[int] = None) -> None:
+        """
+        Fills an order of the collection, as 'fill' does, but takes the order itself and not an order ID.
+        Matching calls it for every trade, so the order is not looked up or type checked again.
+
+        :param order: The order to be filled.
+        :type order: Order
+        :param volume: The volume to be filled.
+        :type volume: int
+        :param now: The update time in nanoseconds, defaults to the current time.
+        :type now: Optional[int], optional
+        :raises ValueError: If the volume is not positive.
+        :raises ValueError: If the order is not active.
+        :raises ValueError: If the volume is greater than the order volume.
+        """
+        if volume <= 0:
+            raise ValueError("Volume must be positive")
         if not order.status.is_active:
             raise ValueError("Order is not active.")
-        if volume > order.volume:
+        remaining = order.volume - volume
+        if remaining < 0:
             raise ValueError("Volume is greater than order volume")
-        order.volume -= volume
-        if order.volume == 0:
-            self.unlist(order, OrderStatus.FILLED)
+        order.volume = remaining
+        if not remaining:
+            self.__unlist(order, OrderStatus.FILLED, now)
         else:
             order.status = OrderStatus.PARTIALLY_FILLED
+            order.touch(now)
 
     def modify(
         self,
@@ -451,6 +910,7 @@ class OrderList:
     ) -> None:
         """
         Modify an order by updating its price and/or volume.
+        An order moved to a new price is listed at the back of its new level, a volume change alone keeps its place.
 
         :param order: The order to modify. Can be an instance of Order or an order ID.
         :type order: Union[Order, int]
@@ -458,13 +918,13 @@ class OrderList:
         :type price: Optional[float], optional
         :param volume: The new volume for the order, defaults to None.
         :type volume: Optional[int], optional
-        :param relist: Whether to relist the order after modification, defaults to True.
+        :param relist: Whether to relist the order after modification, defaults to True. A listed order stays listed either way.
         :type relist: bool, optional
         :raises ValueError: If price or volume is not positive.
         :raises ValueError: If the provided order ID is not found.
         :raises ValueError: If the order type is invalid.
         """
-        if any([price <= 0, volume <= 0]):
+        if (price is not None and price <= 0) or (volume is not None and volume <= 0):
             raise ValueError("Price and volume must be positive")
         if isinstance(order, int):
             order = self.__ids.get(order)
@@ -473,36 +933,125 @@ class OrderList:
         elif not isinstance(order, Order):
             raise ValueError("Invalid order type")
 
-        if relist:
-            if order.status.is_active:
-                self.__order_list.remove(order)
-            else:
-                print("Warning: Order is not active, it will not be relisted")
-                relist = False
+        if relist and not order.status.is_active:
+            warnings.warn("Order is not active, it will not be relisted", stacklevel=2)
+            relist = False
         order = self.__ids[order.id]
-        if price is not None:
-            order.price = price
+        if price is not None and float(price) != order.price:
+            # the order leaves its level before its price key changes
+            was_listed = order.is_listed
+            self.__discard(order)
+            order.price = float(price)
+            if was_listed and not relist:
+                self.__insert(order)
         if volume is not None:
             order.volume = volume
+        order.touch()
+        if not order.status.is_active:
+            self.__retire(order)
         if relist:
             order.status = OrderStatus.MODIFIED
-            self.__order_list.add(order)
+            # an order that keeps its price keeps its place in the level
+            if not order.is_listed:
+                order.listed = time.time_ns()
+                self.__insert(order)
 
     def clear(self) -> None:
         """
         Clears the collection of all orders.
         """
-        self.__order_list.clear()
+        for order in self:
+            order.is_listed = False
+        self.__levels.clear()
         self.__ids.clear()
+        self.__inactive.clear()
+        self.__best = None
 
     def __getitem__(self, order_id):
         return self.__ids[order_id]
 
-    def __iter__(self):
-        return iter(self.__order_list)
+    def __contains__(self, order: Union[Order, int]) -> bool:
+        if isinstance(order, Order):
+            return self.__ids.get(order.id) is order
+        return order in self.__ids
+
+    def __iter__(self) -> Iterator[Order]:
+        return chain.from_iterable(level.values() for level in self.__levels.values())
 
     def __len__(self):
         return len(self.__ids)
 
     def __repr__(self):
-        return str(self.__order_list)
+        return str(list(self))
+
+
+class Tape:
+    """
+    Tape is a columnar record of trades. Every trade field is kept in its own typed array,
+    so recording a trade appends a few machine words instead of allocating a dict of boxed values.
+
+    Attributes:
+        order (array): The IDs of the orders that initiated the trades.
+        contr_order (array): The IDs of the counter orders.
+        price (array): The trade prices.
+        volume (array): The traded volumes.
+        time (array): The trade times, in nanoseconds since the epoch.
+
+    Methods:
+        append(order: int, contr_order: int, price: float, volume: int, time_: int) -> None: Records a trade.
+        clear() -> None: Removes all trades from the tape.
+    """
+
+    COLUMNS = ("order", "contr_order", "price", "volume", "time")
+
+    def __init__(self) -> None:
+        self.order = array("q")
+        self.contr_order = array("q")
+        self.price = array("d")
+        self.volume = array("q")
+        self.time = array("q")
+
+    def append(
+        self, order: int, contr_order: int, price: float, volume: int, time_: int
+    ) -> None:
+        """
+        Records a trade at the end of the tape.
+
+        :param order: The ID of the order that initiated the trade.
+        :type order: int
+        :param contr_order: The ID of the counter order.
+        :type contr_order: int
+        :param price: The trade price.
+        :type price: float
+        :param volume: The traded volume.
+        :type volume: int
+        :param time_: The trade time, in nanoseconds since the epoch.
+        :type time_: int
+        """
+        self.order.append(order)
+        self.contr_order.append(contr_order)
+        self.price.append(price)
+        self.volume.append(volume)
+        self.time.append(time_)
+
+    def clear(self) -> None:
+        """
+        Removes all trades from the tape.
+        """
+        for column in self.COLUMNS:
+            del getattr(self, column)[:]
+
+    def __getitem__(self, index: int) -> Dict[str, Union[int, float]]:
+        return {column: getattr(self, column)[index] for column in self.COLUMNS}
+
+    def __iter__(self) -> Iterator[Dict[str, Union[int, float]]]:
+        for row in zip(
+            self.order, self.contr_order, self.price, self.volume, self.time
+        ):
+            yield dict(zip(self.COLUMNS, row))
+
+    def __len__(self):
+        return len(self.order)
+
+    def __repr__(self):
+        return str(list(self))
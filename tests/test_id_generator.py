@@ -0,0 +1,90 @@
+import atexit
+
+import pytest
+
+from structures import OrderIdGenerator
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def read_state(state_dir):
+    return (state_dir / "current_state.txt").read_bytes()
+
+
+def abandon(generator):
+    # stands in for a crash: the generator is dropped without closing it
+    atexit.unregister(generator.close)
+    generator._state.close()
+
+
+def test_first_id_reserves_a_block_in_a_fixed_width_file(state_dir):
+    generator = OrderIdGenerator()
+    assert read_state(state_dir) == b"0" * OrderIdGenerator.STATE_WIDTH
+
+    assert [generator.next_id() for _ in range(3)] == [0, 1, 2]
+    assert read_state(state_dir) == b"%020d" % OrderIdGenerator.RESERVE_SIZE
+    assert len(read_state(state_dir)) == OrderIdGenerator.STATE_WIDTH
+    generator.close()
+
+
+def test_restart_after_close_resumes_after_the_last_issued_id(state_dir):
+    generator = OrderIdGenerator()
+    for _ in range(5):
+        generator.next_id()
+    generator.close()
+    assert read_state(state_dir) == b"%020d" % 5
+
+    restarted = OrderIdGenerator()
+    assert restarted.next_id() == 5
+    restarted.close()
+
+
+def test_restart_after_crash_skips_the_rest_of_the_block(state_dir):
+    generator = OrderIdGenerator()
+    for _ in range(5):
+        generator.next_id()
+    abandon(generator)
+
+    restarted = OrderIdGenerator()
+    assert restarted.next_id() == OrderIdGenerator.RESERVE_SIZE
+    restarted.close()
+
+
+def test_next_block_is_reserved_when_the_current_one_is_used_up(state_dir, monkeypatch):
+    monkeypatch.setattr(OrderIdGenerator, "RESERVE_SIZE", 2)
+    generator = OrderIdGenerator()
+    assert [generator.next_id() for _ in range(3)] == [0, 1, 2]
+    assert read_state(state_dir) == b"%020d" % 4
+    generator.close()
+
+
+def test_reset_state_is_persisted(state_dir):
+    generator = OrderIdGenerator()
+    for _ in range(5):
+        generator.next_id()
+    generator.reset_state()
+    assert read_state(state_dir) == b"0" * OrderIdGenerator.STATE_WIDTH
+    abandon(generator)
+
+    restarted = OrderIdGenerator()
+    assert restarted.next_id() == 0
+    restarted.close()
+
+
+def test_close_twice_and_use_after_close(state_dir):
+    generator = OrderIdGenerator()
+    assert generator.next_id() == 0
+    generator.close()
+    generator.close()
+    assert read_state(state_dir) == b"%020d" % 1
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match="closed"):
+            generator.next_id()
+    with pytest.raises(ValueError, match="closed"):
+        generator.reset_state()
+    assert generator.id_counter == 1
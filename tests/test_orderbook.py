@@ -0,0 +1,140 @@
+import random
+
+from orderbook import OrderBook
+from structures import Order, OrderStatus, OrderType
+
+
+def make_order(id_, order_type, price, volume):
+    return Order(id=id_, order_type=order_type, price=price, volume=volume, owner_id=1)
+
+
+def trades(order_book):
+    return [
+        (row["order"], row["contr_order"], row["volume"]) for row in order_book.tape
+    ]
+
+
+def test_match_yields_counter_orders_once_in_price_time_priority():
+    order_book = OrderBook()
+    order_book.add(make_order(1, OrderType.ASK, 101, 5))
+    order_book.add(make_order(2, OrderType.ASK, 100, 5))
+    order_book.add(make_order(3, OrderType.ASK, 100, 5))
+    order_book.add(make_order(4, OrderType.ASK, 102, 5))
+
+    bid = make_order(5, OrderType.BID, 101, 30)
+    assert [order.id for order in order_book.match(bid)] == [2, 3, 1]
+
+
+def test_fill_with_match_consumes_levels_in_order():
+    order_book = OrderBook()
+    order_book.add(make_order(1, OrderType.BID, 99, 5))
+    order_book.add(make_order(2, OrderType.BID, 100, 5))
+
+    ask = make_order(3, OrderType.ASK, 99, 7)
+    order_book.ask.add(ask)
+    order_book.fill(ask, order_book.match(ask))
+
+    assert trades(order_book) == [(3, 2, 5), (3, 1, 2)]
+    assert ask.status == OrderStatus.FILLED
+    assert order_book.bid.get(1).volume == 3
+    assert [order.id for order in order_book.bid] == [1]
+
+
+def test_add_matches_and_rests_the_remainder():
+    order_book = OrderBook()
+    order_book.add(make_order(1, OrderType.ASK, 100, 4))
+    order_book.add(make_order(2, OrderType.ASK, 100, 4))
+
+    bid = make_order(3, OrderType.BID, 100, 10)
+    order_book.add(bid)
+
+    assert trades(order_book) == [(3, 1, 4), (3, 2, 4)]
+    assert bid.status == OrderStatus.PARTIALLY_FILLED
+    assert list(order_book.ask) == []
+    assert [order.id for order in order_book.bid] == [3]
+
+
+def test_add_ask_matches_only_bids_it_crosses():
+    order_book = OrderBook()
+    order_book.add(make_order(1, OrderType.BID, 99, 5))
+    order_book.add(make_order(2, OrderType.BID, 101, 5))
+
+    order_book.add(make_order(3, OrderType.ASK, 102, 5))
+    assert trades(order_book) == []
+    order_book.add(make_order(4, OrderType.ASK, 100, 8))
+
+    assert trades(order_book) == [(4, 2, 5)]
+    assert [order.id for order in order_book.ask] == [4, 3]
+    assert [order.id for order in order_book.bid] == [1]
+
+
+def book_state(order_book):
+    return (
+        trades(order_book),
+        [(order.id, order.volume, order.status) for order in order_book.ask],
+        [(order.id, order.volume, order.status) for order in order_book.bid],
+    )
+
+
+def assert_add_many_matches_sequential_add(resting, batch):
+    def build(orders):
+        return [make_order(*fields) for fields in orders]
+
+    bulk, sequential = OrderBook(), OrderBook()
+    for order_book in (bulk, sequential):
+        for order in build(resting):
+            order_book.add(order)
+    bulk.add_many(build(batch))
+    for order in build(batch):
+        sequential.add(order)
+
+    assert book_state(bulk) == book_state(sequential)
+    return bulk
+
+
+def test_add_many_without_crossing_matches_sequential_add():
+    order_book = assert_add_many_matches_sequential_add(
+        [(1, OrderType.ASK, 105, 5), (2, OrderType.BID, 95, 5)],
+        [
+            (3, OrderType.ASK, 104, 3),
+            (4, OrderType.ASK, 104, 2),
+            (5, OrderType.BID, 96, 4),
+            (6, OrderType.ASK, 106, 1),
+        ],
+    )
+    assert trades(order_book) == []
+
+
+def test_add_many_crossing_the_book_matches_sequential_add():
+    order_book = assert_add_many_matches_sequential_add(
+        [(1, OrderType.ASK, 100, 5), (2, OrderType.ASK, 101, 5)],
+        [(3, OrderType.BID, 99, 2), (4, OrderType.BID, 101, 7)],
+    )
+    assert trades(order_book) == [(4, 1, 5), (4, 2, 2)]
+
+
+def test_add_many_crossing_itself_matches_sequential_add():
+    order_book = assert_add_many_matches_sequential_add(
+        [],
+        [
+            (1, OrderType.BID, 100, 5),
+            (2, OrderType.ASK, 99, 3),
+            (3, OrderType.ASK, 100, 4),
+        ],
+    )
+    assert trades(order_book) == [(2, 1, 3), (3, 1, 2)]
+
+
+def test_add_many_random_batches_match_sequential_add():
+    rng = random.Random(7)
+    next_id = 1
+    for _ in range(50):
+        orders = []
+        for _ in range(rng.randint(1, 30)):
+            order_type = rng.choice([OrderType.ASK, OrderType.BID])
+            orders.append(
+                (next_id, order_type, rng.randint(95, 105), rng.randint(1, 9))
+            )
+            next_id += 1
+        split = rng.randint(0, len(orders))
+        assert_add_many_matches_sequential_add(orders[:split], orders[split:])
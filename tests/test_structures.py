@@ -0,0 +1,267 @@
+import time
+
+import pytest
+
+from orderbook import OrderBook
+from structures import Order, OrderList, OrderPool, OrderStatus, OrderType
+
+
+def make_order(id_, price=100, volume=5, order_type=OrderType.ASK, **fields):
+    return Order(
+        id=id_, order_type=order_type, price=price, volume=volume, owner_id=1, **fields
+    )
+
+
+def test_pop_old_reaches_older_orders_added_after_younger_ones():
+    now = time.time_ns()
+    order_list = OrderList(OrderType.ASK)
+    order_list.add(make_order(1, status=OrderStatus.CANCELLED, updated=now))
+    order_list.add(
+        make_order(2, status=OrderStatus.CANCELLED, updated=now - 1000 * 10**9)
+    )
+
+    assert [order.id for order in order_list.pop_old(now - 10**9)] == [2]
+    assert 1 in order_list and 2 not in order_list
+
+
+def test_pop_old_skips_restored_and_removed_orders():
+    order_list = OrderList(OrderType.ASK)
+    for id_ in (1, 2, 3):
+        order_list.add(make_order(id_))
+        order_list.cancel(id_)
+    order_list.relist(1)
+    order_list.remove(2)
+
+    assert [order.id for order in order_list.pop_old(time.time_ns() + 1)] == [3]
+    assert 1 in order_list
+
+
+def test_contains_accepts_ids_and_orders():
+    order_list = OrderList(OrderType.ASK)
+    order = make_order(1)
+    order_list.add(order)
+
+    assert 1 in order_list and 2 not in order_list
+    assert order in order_list
+    assert make_order(1) not in order_list
+
+
+def listed_ids(order_list):
+    return [order.id for order in order_list]
+
+
+def make_order_list(*prices):
+    order_list = OrderList(OrderType.ASK)
+    for id_, price in enumerate(prices, 1):
+        order_list.add(make_order(id_, price=price))
+    return order_list
+
+
+def test_modify_price_with_relist_moves_to_back_of_new_level():
+    order_list = make_order_list(100, 101, 101)
+    order_list.modify(1, price=101)
+
+    assert listed_ids(order_list) == [2, 3, 1]
+    assert order_list[1].status == OrderStatus.MODIFIED
+    assert order_list.best_price() == 101
+
+
+def test_modify_volume_with_relist_keeps_place():
+    order_list = make_order_list(100, 100)
+    order_list.modify(1, price=100, volume=9)
+
+    assert listed_ids(order_list) == [1, 2]
+    assert order_list[1].volume == 9
+    assert order_list[1].status == OrderStatus.MODIFIED
+
+
+def test_modify_price_without_relist_keeps_order_listed():
+    order_list = make_order_list(100, 101)
+    order_list.modify(1, price=102, relist=False)
+
+    assert listed_ids(order_list) == [2, 1]
+    assert order_list[1].is_listed
+    assert order_list[1].status == OrderStatus.CREATED
+    assert order_list.best_price() == 101
+
+
+def test_modify_volume_without_relist_keeps_place_and_status():
+    order_list = make_order_list(100, 100)
+    order_list.modify(1, volume=2, relist=False)
+
+    assert listed_ids(order_list) == [1, 2]
+    assert order_list[1].volume == 2
+    assert order_list[1].status == OrderStatus.CREATED
+
+
+def test_modify_inactive_order_is_not_relisted():
+    order_list = make_order_list(100)
+    order_list.cancel(1)
+    with pytest.warns(UserWarning):
+        order_list.modify(1, price=101)
+    order_list.modify(1, volume=3, relist=False)
+
+    assert listed_ids(order_list) == []
+    assert order_list[1].price == 101
+    assert order_list[1].volume == 3
+    assert order_list[1].status == OrderStatus.CANCELLED
+
+
+def test_modified_order_without_relist_still_matches():
+    order_book = OrderBook()
+    bid = Order(id=1, order_type=OrderType.BID, price=99, volume=5, owner_id=1)
+    order_book.add(bid)
+    order_book.bid.modify(bid, price=101, relist=False)
+    order_book.add(
+        Order(id=2, order_type=OrderType.ASK, price=100, volume=5, owner_id=2)
+    )
+
+    assert bid.status == OrderStatus.FILLED
+    assert len(order_book.tape) == 1
+
+
+def test_pool_get_builds_an_order_when_empty():
+    pool = OrderPool()
+    order = pool.get(id=1, order_type=OrderType.BID, price=10, volume=3, owner_id=2)
+
+    assert isinstance(order, Order)
+    assert (order.id, order.order_type, order.price) == (1, OrderType.BID, 10.0)
+    assert len(pool) == 0
+
+
+def test_pool_put_and_get_reuse_the_order_with_every_field_reset():
+    order_list = OrderList(OrderType.ASK)
+    order = make_order(1)
+    order_list.add(order)
+    order_list.fill(order, 5)
+    order_list.remove(order)
+    pool = OrderPool()
+    pool.put(order)
+
+    assert (order.status, order.is_listed) == (OrderStatus.FILLED, False)
+    old_created = order.created
+
+    reused = pool.get(id=2, order_type=OrderType.BID, price=7, volume=4, owner_id=3)
+
+    assert reused is order
+    assert len(pool) == 0
+    assert reused.to_dict() == {
+        "id": 2,
+        "order_type": OrderType.BID,
+        "price": 7.0,
+        "volume": 4,
+        "owner_id": 3,
+        "status": OrderStatus.CREATED,
+        "created": reused.created,
+        "updated": reused.created,
+        "listed": None,
+        "is_listed": False,
+    }
+    assert reused.created >= old_created
+
+
+def test_pool_get_keeps_given_timestamps_and_status():
+    pool = OrderPool()
+    pool.put(make_order(1))
+
+    order = pool.get(
+        id=2,
+        order_type=OrderType.ASK,
+        price=1,
+        volume=1,
+        owner_id=1,
+        status=OrderStatus.RESTORED,
+        created=10,
+        updated=20,
+        listed=30,
+    )
+
+    assert (order.status, order.created, order.updated, order.listed) == (
+        OrderStatus.RESTORED,
+        10,
+        20,
+        30,
+    )
+
+
+def test_pool_rejects_listed_orders_and_invalid_fields():
+    order_list = OrderList(OrderType.ASK)
+    order = make_order(1)
+    order_list.add(order)
+    pool = OrderPool()
+    with pytest.raises(ValueError):
+        pool.put(order)
+
+    order_list.remove(order)
+    pool.put(order)
+    with pytest.raises(ValueError):
+        pool.get(id=0, order_type=OrderType.ASK, price=1, volume=1, owner_id=1)
+    assert len(pool) == 1
+
+
+def test_remove_order_recycles_only_on_request():
+    order_book = OrderBook()
+    kept = make_order(1)
+    order_book.add(kept)
+    order_book.remove_order(kept)
+    assert len(order_book.pool) == 0
+    assert kept.id == 1
+
+    recycled = make_order(2)
+    order_book.add(recycled)
+    order_book.remove_order(recycled, recycle=True)
+    assert (
+        order_book.pool.get(
+            id=3, order_type=OrderType.ASK, price=1, volume=1, owner_id=1
+        )
+        is recycled
+    )
+
+
+def test_order_type_accepts_former_string_values():
+    assert OrderType("ask") is OrderType.ASK
+    assert make_order(1, order_type="bid").order_type is OrderType.BID
+    assert make_order(2, order_type="BID").order_type is OrderType.BID
+    with pytest.raises(ValueError):
+        make_order(3, order_type="hold")
+
+    order_book = OrderBook()
+    order = make_order(4)
+    order_book.add(order)
+    assert order_book.get_order(4, "ask") is order
+
+
+def test_order_volume_must_be_an_integer():
+    order = make_order(1, volume=2.0)
+    assert order.volume == 2 and order.volume.__class__ is int
+    for volume in (2.5, "3", True):
+        with pytest.raises(ValueError):
+            make_order(2, volume=volume)
+
+
+def test_fill_order_fills_the_given_order():
+    order_list = make_order_list(100)
+    order = order_list[1]
+    order_list.fill_order(order, 2, now=10)
+    assert (order.volume, order.status, order.updated) == (
+        3,
+        OrderStatus.PARTIALLY_FILLED,
+        10,
+    )
+
+    order_list.fill_order(order, 3)
+    assert order.status == OrderStatus.FILLED and listed_ids(order_list) == []
+    with pytest.raises(ValueError):
+        order_list.fill_order(order, 1)
+
+
+def test_order_status_is_a_member_with_an_active_flag():
+    order = make_order(1, status=int(OrderStatus.CANCELLED))
+    assert order.status is OrderStatus.CANCELLED
+    assert not order.status.is_active
+    assert [status for status in OrderStatus if status.is_active] == [
+        OrderStatus.CREATED,
+        OrderStatus.PARTIALLY_FILLED,
+        OrderStatus.MODIFIED,
+        OrderStatus.RESTORED,
+    ]